@@ -1,27 +1,231 @@
+import hashlib
+import json
 import logging
-from typing import Optional
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
-import requests
+import jwt
+import urllib3
 
+logger = logging.getLogger(__name__)
+
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "60"))
+AUTH_NEGATIVE_CACHE_TTL = 5.0
+AUTH_CACHE_MAXSIZE = 10_000
+AUTH_NEGATIVE_CACHE_MAXSIZE = 1_000
+TOKEN_MIN_LENGTH = 20
+TOKEN_MAX_LENGTH = 8192
+JWT_ALGORITHMS = ["RS256"]
+JWKS_MIN_REFRESH_INTERVAL = 30.0
+
+_JWT_RE = re.compile(rb"[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+\.[A-Za-z0-9_\-]+")
+
+# shared pool so auth calls reuse keep-alive connections instead of a new TCP/TLS handshake each time;
+# plain urllib3 avoids the per-call Session/adapter overhead of requests for this single small POST
+_POOL = urllib3.PoolManager(
+    num_pools=4,
+    maxsize=64,
+    timeout=urllib3.Timeout(total=10),
+    # token validation is idempotent, so POST is safe to retry
+    retries=urllib3.Retry(
+        total=2,
+        backoff_factor=0.1,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=["GET", "POST"],
+        raise_on_status=False,
+    ),
+)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# sha256(token) -> (utf-8 user id or None, expiry timestamp); the user id is cached already encoded since
+# it is used as the routing identity, so the encode happens once per token. Accepted and rejected tokens live in separate
+# caches so a flood of junk tokens can only evict other rejections. Each cache has a fixed TTL, so
+# insertion order is expiry order and both expiry and eviction pop from the front in O(1).
+_token_cache: "OrderedDict[bytes, Tuple[bytes, float]]" = OrderedDict()
+_negative_token_cache: "OrderedDict[bytes, Tuple[None, float]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def _cache_get(key: bytes) -> Tuple[bool, Optional[bytes]]:
+    now = time.monotonic()
+    with _token_cache_lock:
+        for cache in (_token_cache, _negative_token_cache):
+            entry = cache.get(key)
+            if entry is None:
+                continue
+            identity, expiry = entry
+            if expiry <= now:
+                del cache[key]
+                return False, None
+            return True, identity
+        return False, None
+
+
+def _cache_put(key: bytes, identity: Optional[bytes]) -> None:
+    if identity:
+        cache, ttl, maxsize = _token_cache, AUTH_CACHE_TTL, AUTH_CACHE_MAXSIZE
+    else:
+        cache, ttl, maxsize = _negative_token_cache, AUTH_NEGATIVE_CACHE_TTL, AUTH_NEGATIVE_CACHE_MAXSIZE
+    if ttl <= 0:
+        return
+    now = time.monotonic()
+    with _token_cache_lock:
+        cache.pop(key, None) # re-insert at the back so order stays expiry order
+        while cache and next(iter(cache.values()))[1] <= now:
+            cache.popitem(last=False)
+        if len(cache) >= maxsize:
+            cache.popitem(last=False)
+        cache[key] = (identity, now + ttl)
+
+
+def is_plausible_token(token: bytes, expect_jwt: bool = False) -> bool:
+    """
+    Cheap format check run before any auth call, so obvious junk never reaches the auth service.
+    """
+    if not TOKEN_MIN_LENGTH <= len(token) <= TOKEN_MAX_LENGTH:
+        return False
+    return not expect_jwt or _JWT_RE.fullmatch(token) is not None
+
+
+class JwksUnavailableError(Exception):
+    """
+    Raised when no signing key is available to verify a token offline.
+    """
+
+
+class JwtValidator:
+    """
+    Verify JWT signatures locally against the identity provider's JWKS.
+    Keys are fetched lazily, cached by kid and refreshed when an unknown kid shows up.
+    """
+
+    def __init__(self, issuer: str, audience: Optional[str] = None, algorithms: Optional[List[str]] = None):
+        # iss is compared exactly as configured; only the JWKS URL is normalized
+        self.issuer = issuer
+        self.audience = audience
+        self.algorithms = algorithms or JWT_ALGORITHMS
+        self.jwks_url = f"{issuer.rstrip('/')}/.well-known/jwks.json"
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._keys_lock = threading.Lock()
+        self._last_refresh = float("-inf")
+
+    def _refresh_keys(self) -> None:
+        # caller holds self._keys_lock
+        self._last_refresh = time.monotonic()
+        try:
+            response = _POOL.request("GET", self.jwks_url)
+            if response.status != 200:
+                raise urllib3.exceptions.HTTPError(f"status={response.status}")
+            jwk_set = jwt.PyJWKSet.from_dict(json.loads(response.data))
+        except (urllib3.exceptions.HTTPError, ValueError, jwt.PyJWTError) as exc:
+            logger.error("JWKS fetch from %s failed: %s", self.jwks_url, exc)
+            return
+        self._keys = {key.key_id: key for key in jwk_set.keys if key.key_id}
+        logger.info("Loaded %d signing keys from %s", len(self._keys), self.jwks_url)
+
+    def _get_key(self, kid: str) -> jwt.PyJWK:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        with self._keys_lock:
+            key = self._keys.get(kid)
+            if key is None and time.monotonic() - self._last_refresh >= JWKS_MIN_REFRESH_INTERVAL:
+                self._refresh_keys()
+                key = self._keys.get(kid)
+        if key is None:
+            raise JwksUnavailableError(f"no signing key for kid={kid!r}")
+        return key
+
+    def validate(self, token: str) -> Optional[str]:
+        """
+        Return the token's sub claim, or None if the token is invalid.
+        Raises JwksUnavailableError if the token cannot be verified offline.
+        """
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.PyJWTError as exc:
+            logger.warning("Malformed JWT: %s", exc)
+            return None
+        if not kid:
+            raise JwksUnavailableError("token header has no kid")
+
+        key = self._get_key(kid)
+        try:
+            claims = jwt.decode(
+                token,
+                key=key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                # with no audience configured PyJWT still rejects tokens that carry an aud claim,
+                # so tokens minted for other clients of the IdP are not accepted here
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as exc:
+            logger.warning("JWT rejected: %s", exc)
+            return None
+
+        user_id = str(claims.get("sub") or "").strip()
+        return user_id or None
+
+
+def _identity(user_id: Optional[str]) -> Optional[bytes]:
+    return user_id.encode("utf-8") if user_id else None
+
+
+def validate_token(auth_api_url: Optional[str], token: str, jwt_validator: Optional[JwtValidator] = None) -> Optional[bytes]:
+    """
+    Resolve a token to its user id, utf-8 encoded (the server routing identity).
+    With a JwtValidator the token is verified offline; the auth API is only used as a
+    fallback when no signing key is available. Auth API results go through the in-process
+    TTL cache, with rejected tokens cached for a shorter period to avoid hammering the API.
+    """
+    if jwt_validator is not None:
+        try:
+            return _identity(jwt_validator.validate(token))
+        except JwksUnavailableError as exc:
+            logger.debug("Offline validation unavailable (%s), falling back to auth API", exc)
+    if not auth_api_url:
+        logger.warning("Token cannot be validated: no signing key and no auth API configured")
+        return None
+
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    hit, identity = _cache_get(key)
+    if hit:
+        return identity
 
-def validate_token(auth_api_url: str, token: str) -> Optional[str]:
     try:
-        response = requests.post(
-            auth_api_url,
-            json={"token": token},
-            timeout=10,
-        )
-    except requests.exceptions.RequestException as exc:
-        logging.error("Auth request failed: %s", exc)
+        identity = _identity(_request_user_id(auth_api_url, token))
+    except (urllib3.exceptions.HTTPError, ValueError) as exc:
+        # transport failures and unparseable responses are not cached so the token is retried on the next request
+        logger.error("Auth request failed: %s", exc)
         return None
+    _cache_put(key, identity)
+    return identity
+
+
+def _request_user_id(auth_api_url: str, token: str) -> Optional[str]:
+    response = _POOL.request(
+        "POST",
+        auth_api_url,
+        body=json.dumps({"token": token}).encode("utf-8"),
+        headers=_JSON_HEADERS,
+    )
 
-    if response.status_code != 200:
-        logging.warning("Auth rejected token: status=%s", response.status_code)
+    if response.status in (401, 403):
+        logger.warning("Auth rejected token: status=%s", response.status)
         return None
+    if response.status != 200:
+        # 5xx left over after retries (and any other unexpected status) is an auth service failure, not a rejection
+        raise urllib3.exceptions.HTTPError(f"auth API returned status={response.status}")
 
-    data = response.json()
+    data = json.loads(response.data)
     user_id = str(data.get("sub") or "").strip()
     if not user_id:
-        logging.warning("Auth response missing user id")
+        logger.warning("Auth response missing user id")
         return None
     return user_id
@@ -1,53 +1,122 @@
 import logging
 import os
+import select
+import signal
+import socket
 import threading
 import time
-from typing import Any, Dict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Set, Tuple
 
 import dill
 import zmq
 import zmq.utils.monitor
 
-from rexec_broker.auth import validate_token
+from rexec_broker.auth import JwtValidator, is_plausible_token, validate_token
 from rexec_broker.frames import format_identity, log_routing_envelope, split_envelope
 
+logger = logging.getLogger(__name__)
+
 EVENT_MAP = {}
 HEARTBEAT_FRAME = b"__REXEC_HEARTBEAT__"
+READY_FRAME = b"__REXEC_READY__"
+WORKER_TIMEOUT = 30.0 # pooled workers silent (no heartbeat/READY/reply) for this long are dropped
+WORKER_SWEEP_INTERVAL = 1.0
+MAX_PENDING_REQUESTS = 1000 # per user, while all of their pooled workers are busy
 STREAM_CANCEL_FRAME = b"__REXEC_CANCEL__"
+AUTH_WORKERS = 32
+# token validations queued or running; at the global cap the proxy stops reading client requests so libzmq's
+# RCVHWM pushes back on clients, and a client whose shard is full is failed fast. The global cap stays within
+# the auth results socket HWM, so auth threads never block handing a result back.
+AUTH_MAX_IN_FLIGHT = 1000
+AUTH_MAX_IN_FLIGHT_PER_WORKER = 100
+# first frame of an auth result: whether it carries a client request or a pooled worker's READY
+AUTH_FROM_CLIENT = b"client"
+AUTH_FROM_WORKER = b"worker"
+ZERO_COPY_THRESHOLD = zmq.COPY_THRESHOLD
+SOCKET_HWM = 10_000 # per-peer queue limit on the client/server sockets (libzmq default is 1000)
+ERROR_PICKLE_PROTOCOL = 5 # pinned rather than HIGHEST_PROTOCOL so clients on older Pythons can still unpickle
+DRAIN_BATCH = 256 # max messages read from one socket per loop pass, so a busy socket cannot starve the others
+# serialized once at import; these are the fixed error replies sent on the hot path
+_ERROR_PAYLOADS = {
+    message: dill.dumps(message, protocol=ERROR_PICKLE_PROTOCOL)
+    for message in (
+        "Invalid request framing.",
+        "Malformed token.",
+        "Token is not valid utf-8.",
+        "Token validation failed.",
+        "Too many requests awaiting authentication.",
+    )
+}
 
 def setup_event_map(event_map: list):
-    logging.debug("Event names:")
+    logger.debug("Event names:")
     for name in dir(zmq):
         if name.startswith('EVENT_'):
             value = getattr(zmq, name)
-            logging.debug(f"{name:21} : {value:4}")
+            logger.debug("%-21s : %4d", name, value)
             event_map[value] = name
 
+def drain(sock: zmq.Socket, limit: int = DRAIN_BATCH, zero_copy: bool = False):
+    """
+    Yield the multipart messages already queued on sock, without blocking.
+    The proxy loop re-checks zmq.EVENTS before blocking, so stopping at limit never loses a wakeup.
+    With zero_copy, frames of at least ZERO_COPY_THRESHOLD bytes stay zmq.Frame so they can be forwarded
+    without a copy; smaller ones (identities, delimiter, token, control frames) are returned as bytes.
+    This only pays off for large payloads, since building a Frame per part costs more than copying small ones.
+    """
+    for _ in range(limit):
+        try:
+            frames = sock.recv_multipart(zmq.NOBLOCK, copy=not zero_copy)
+        except zmq.Again:
+            return
+        if zero_copy:
+            frames = [frame if len(frame) >= ZERO_COPY_THRESHOLD else frame.bytes for frame in frames]
+        yield frames
+
 def event_monitor(monitor_socket: zmq.Socket, socket_name: str) -> None:
-    while monitor_socket.poll():
-        evt: Dict[str, Any] = {}
-        mon_evt = zmq.utils.monitor.recv_monitor_message(monitor_socket)
-        evt.update(mon_evt)
-        evt['description'] = EVENT_MAP[evt['event']]
-        logging.debug(f"{socket_name} Event: {evt}")
+    # blocking recv; the loop ends when disable_monitor() delivers EVENT_MONITOR_STOPPED
+    while True:
+        evt: Dict[str, Any] = zmq.utils.monitor.recv_monitor_message(monitor_socket)
+        evt['description'] = EVENT_MAP.get(evt['event'], evt['event'])
+        logger.debug("%s Event: %s", socket_name, evt)
 
         if evt['event'] == zmq.EVENT_MONITOR_STOPPED:
             break
 
     monitor_socket.close()
-    logging.debug("event monitor thread done!")
+    logger.debug("event monitor thread done!")
 
 class RExecBroker:
     def __init__(self, args):
-        self.zmq_context = zmq.Context()
+        # roughly one I/O thread per GB/s of traffic; large pargs/pret payloads saturate a single one
+        self.zmq_context = zmq.Context(io_threads=args.io_threads)
+        # close without waiting for undelivered messages so shutdown never hangs on a dead peer
+        self.zmq_context.setsockopt(zmq.LINGER, 0)
         self.server_last_seen: Dict[bytes, float] = {} # server_id, last seen timestamp; for heartbeat tracking
+
+        # Per-user worker pools: servers that connect with their own identity and announce
+        # [b"", READY_FRAME, token] whenever they are idle; the token's user id picks the pool. Servers that
+        # connect with identity == user_id and never send READY keep the 1:1 routing, and take precedence while alive.
+        self.user_workers: Dict[bytes, Set[bytes]] = {} # user server_id -> registered worker ids
+        self.worker_users: Dict[bytes, bytes] = {} # worker id -> user server_id
+        self.idle_workers: Dict[bytes, Deque[bytes]] = {} # user server_id -> idle worker ids, least recently ready first
+        self.pending_requests: Dict[bytes, Deque[Tuple[list, list]]] = {} # user server_id -> (envelope, body) waiting for a worker
+        self.client_workers: Dict[bytes, bytes] = {} # client id -> worker running its request; for CANCEL routing
+        self.worker_clients: Dict[bytes, list] = {} # worker id -> client envelope of its current request
+        self._next_worker_sweep = 0.0
         
         self.frontend_zmq_addr = "tcp://*:" + args.client_port
         self.frontend_socket = self.zmq_context.socket(zmq.ROUTER)
+        self.frontend_socket.setsockopt(zmq.SNDHWM, SOCKET_HWM)
+        self.frontend_socket.setsockopt(zmq.RCVHWM, SOCKET_HWM)
         self.frontend_socket.bind(self.frontend_zmq_addr)
 
         self.backend_zmq_addr = "tcp://*:" + args.server_port
         self.backend_socket = self.zmq_context.socket(zmq.ROUTER)
+        self.backend_socket.setsockopt(zmq.SNDHWM, SOCKET_HWM)
+        self.backend_socket.setsockopt(zmq.RCVHWM, SOCKET_HWM)
         self.backend_socket.bind(self.backend_zmq_addr)
         self.backend_socket.setsockopt(zmq.ROUTER_MANDATORY, 1) # enable mandatory routing
 
@@ -55,11 +124,37 @@ class RExecBroker:
         self.control_socket = self.zmq_context.socket(zmq.REP)
         self.control_socket.bind(self.control_zmq_addr)
 
+        # token validation runs on worker threads; results come back over inproc PUSH/PULL
+        self._auth_pools = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"auth-{i}") for i in range(AUTH_WORKERS)
+        ]
+        self._auth_local = threading.local()
+        self._auth_senders = [] # every auth thread's PUSH socket, closed once the threads are joined
+        self._auth_stop = threading.Event()
+        self._auth_in_flight = [0] * AUTH_WORKERS # per shard; only touched by the proxy thread
+        self._auth_in_flight_total = 0
+        self.auth_results_addr = "inproc://auth-results"
+        self.auth_results_socket = self.zmq_context.socket(zmq.PULL)
+        self.auth_results_socket.bind(self.auth_results_addr)
+
+        self._epoll = select.epoll()
+        self._signal_rsock = self._signal_wsock = None
+        self._prev_sigterm_handler = None
+        self._prev_wakeup_fd = -1
+        self._stop_requested = False
+
         self.auth_api_url = args.auth_api_url or os.environ.get("AUTH_API_URL")
-        if not self.auth_api_url:
-            raise RuntimeError("AUTH_API_URL is required to validate execution tokens.")
+        jwt_issuer = args.auth_jwt_issuer or os.environ.get("AUTH_JWT_ISSUER")
+        jwt_audience = args.auth_jwt_audience or os.environ.get("AUTH_JWT_AUDIENCE")
+        self.jwt_validator = JwtValidator(jwt_issuer, jwt_audience) if jwt_issuer else None
+        if not self.auth_api_url and not self.jwt_validator:
+            raise RuntimeError("AUTH_API_URL or AUTH_JWT_ISSUER is required to validate execution tokens.")
+
+        # receive large frames as zmq.Frame and forward them without copying; opt-in, see drain()
+        self.zero_copy = args.zero_copy
 
         self.debug = False
+        self.monitor_threads = []
         if args.loglevel == logging.DEBUG:
             if zmq.zmq_version_info() > (4, 0):
                 self.debug = True
@@ -75,159 +170,476 @@ class RExecBroker:
         Send a reply to a client (when server cannot process the request).
         """
         if not envelope:
-            logging.error("Cannot reply to client without routing envelope: %s", message)
+            logger.error("Cannot reply to client without routing envelope: %s", message)
             return
-        payload = dill.dumps(message)
-        self.frontend_socket.send_multipart(envelope + [b"", payload])
+        payload = _ERROR_PAYLOADS.get(message) or dill.dumps(message, protocol=ERROR_PICKLE_PROTOCOL)
+        self.frontend_socket.send_multipart([*envelope, b"", payload])
+
+    def _reply_unavailable(self, envelope, server_id: bytes) -> None:
+        # user id is only decoded here, on the error path
+        self._reply_error(envelope, f"Server not ready/available for user {server_id.decode('utf-8')}.")
 
     def _record_server_activity(self, server_id: bytes) -> None:
         self.server_last_seen[server_id] = time.monotonic()
 
-    def _is_heartbeat(self, payload) -> bool:
-        envelope, delimiter_index, body = split_envelope(payload)
+    def _is_heartbeat(self, envelope, delimiter_index, body) -> bool:
         if delimiter_index is None or envelope:
             return False
         return len(body) == 1 and body[0] == HEARTBEAT_FRAME
+
+    def _is_ready(self, envelope, delimiter_index, body) -> bool:
+        if delimiter_index is None or envelope:
+            return False
+        return len(body) == 2 and body[0] == READY_FRAME
+
+    def _worker_ready(self, worker_id: bytes, server_id: bytes) -> None:
+        """
+        Mark a pooled worker idle, handing it the oldest pending request of its user if there is one.
+        """
+        if self.worker_users.get(worker_id) != server_id:
+            self._forget_worker(worker_id)
+            self.worker_users[worker_id] = server_id
+            self.user_workers.setdefault(server_id, set()).add(worker_id)
+            self.idle_workers.setdefault(server_id, deque())
+            self._record_server_activity(worker_id)
+            logger.info("Worker %s registered for user %s", format_identity(worker_id), server_id.decode("utf-8", errors="replace"))
+
+        envelope = self.worker_clients.pop(worker_id, None)
+        if envelope and self.client_workers.get(envelope[0]) == worker_id:
+            del self.client_workers[envelope[0]]
+
+        pending = self.pending_requests.get(server_id)
+        if pending:
+            envelope, body = pending.popleft()
+            if not self._send_to_worker(worker_id, envelope, body):
+                # worker is gone; keep the request for the next ready worker if the pool still exists
+                if server_id in self.user_workers:
+                    pending.appendleft((envelope, body))
+                else:
+                    self._reply_unavailable(envelope, server_id)
+            return
+        idle = self.idle_workers[server_id]
+        if worker_id not in idle:
+            idle.append(worker_id)
+
+    def _worker_authenticated(self, worker_id: bytes, server_id: bytes) -> None:
+        """
+        Handle the validated token of a pooled worker's READY; workers whose token is rejected leave their pool.
+        """
+        if not server_id:
+            logger.warning("Worker %s sent READY with an invalid token", format_identity(worker_id))
+            self._forget_worker(worker_id)
+            return
+        self._worker_ready(worker_id, server_id)
+
+    def _submit_worker_auth(self, worker_id: bytes, payload, token: bytes) -> None:
+        # like client requests, READY tokens are checked off the proxy thread
+        if not is_plausible_token(token, expect_jwt=self.jwt_validator is not None):
+            logger.warning("Worker %s sent READY with a malformed token", format_identity(worker_id))
+            self._forget_worker(worker_id)
+            return
+        try:
+            decoded = token.decode("utf-8")
+        except UnicodeDecodeError:
+            logger.warning("Worker %s sent READY with a non utf-8 token", format_identity(worker_id))
+            self._forget_worker(worker_id)
+            return
+        if not self._submit_auth([worker_id, *payload], decoded, AUTH_FROM_WORKER):
+            logger.warning("Dropping READY from worker %s: too many requests awaiting authentication", format_identity(worker_id))
+
+    def _direct_server_alive(self, server_id: bytes) -> bool:
+        # a server connected with identity == user_id that has been heard from recently
+        if server_id in self.worker_users:
+            return False
+        return self.server_last_seen.get(server_id, float("-inf")) >= time.monotonic() - WORKER_TIMEOUT
+
+    def _forget_worker(self, worker_id: bytes) -> None:
+        """
+        Drop a pooled worker; the request it was running (if any) is failed back to its client.
+        """
+        server_id = self.worker_users.pop(worker_id, None)
+        if server_id is None:
+            return
+        self.server_last_seen.pop(worker_id, None)
+        envelope = self.worker_clients.pop(worker_id, None)
+        if envelope:
+            if self.client_workers.get(envelope[0]) == worker_id:
+                del self.client_workers[envelope[0]]
+            self._reply_unavailable(envelope, server_id)
+        workers = self.user_workers.get(server_id)
+        if workers is not None:
+            workers.discard(worker_id)
+            idle = self.idle_workers[server_id]
+            if worker_id in idle:
+                idle.remove(worker_id)
+            if not workers:
+                # no pooled workers left; fall back to 1:1 routing and fail what was waiting
+                del self.user_workers[server_id]
+                del self.idle_workers[server_id]
+                for envelope, _ in self.pending_requests.pop(server_id, ()):
+                    self._reply_unavailable(envelope, server_id)
+
+    def _expire_workers(self) -> None:
+        """
+        Drop pooled workers that have not been heard from within WORKER_TIMEOUT.
+        """
+        deadline = time.monotonic() - WORKER_TIMEOUT
+        for worker_id in [w for w in self.worker_users if self.server_last_seen.get(w, 0.0) < deadline]:
+            logger.warning("Worker %s silent for over %.0fs, removing from pool", format_identity(worker_id), WORKER_TIMEOUT)
+            self._forget_worker(worker_id)
+
+    def _send_to_worker(self, worker_id: bytes, envelope, body) -> bool:
+        """
+        Send an INVOKE to one pooled worker; unreachable workers are dropped from the pool.
+        """
+        try:
+            self.backend_socket.send_multipart([worker_id, *envelope, b"", *body], copy=False)
+        except zmq.ZMQError as exc:
+            logger.warning("Worker %s unreachable, removing from pool: %s", format_identity(worker_id), exc)
+            self._forget_worker(worker_id)
+            return False
+        if envelope:
+            self.client_workers[envelope[0]] = worker_id
+            self.worker_clients[worker_id] = envelope
+        return True
+
+    def _cancel_pending(self, server_id: bytes, client_id: bytes) -> bool:
+        pending = self.pending_requests.get(server_id)
+        if not pending:
+            return False
+        for request in pending:
+            if request[0] and request[0][0] == client_id:
+                pending.remove(request)
+                return True
+        return False
+
+    def _dispatch_to_pool(self, server_id: bytes, envelope, body) -> bool:
+        """
+        Dispatch an INVOKE to the least recently ready worker of the user's pool, or queue it until one is ready.
+        Returns False if the user has no pooled workers.
+        """
+        while server_id in self.user_workers:
+            idle = self.idle_workers[server_id]
+            if not idle:
+                pending = self.pending_requests.setdefault(server_id, deque())
+                if len(pending) >= MAX_PENDING_REQUESTS:
+                    self._reply_error(envelope, f"Too many queued requests for user {server_id.decode('utf-8')}.")
+                else:
+                    pending.append((envelope, body))
+                return True
+            if self._send_to_worker(idle.popleft(), envelope, body):
+                return True
+        return False
     
+    def _auth_result_sender(self) -> zmq.Socket:
+        """
+        Per-thread PUSH socket for handing auth results back to the proxy thread (zmq sockets are not thread-safe).
+        """
+        sock = getattr(self._auth_local, "socket", None)
+        if sock is None:
+            sock = self.zmq_context.socket(zmq.PUSH)
+            sock.connect(self.auth_results_addr)
+            self._auth_local.socket = sock
+            self._auth_senders.append(sock)
+        return sock
+
+    def _authenticate(self, frames, token: str, source: bytes) -> None:
+        """
+        Runs on an auth worker thread: validate the token and post the frames back to the proxy thread.
+        """
+        if self._auth_stop.is_set():
+            return
+        # Use user_id as server_id for routing; this assumes a 1:1 mapping between users and servers,
+        # unless the user has a worker pool
+        try:
+            server_id = validate_token(self.auth_api_url, token, self.jwt_validator) or b""
+        except Exception:
+            logger.exception("Token validation raised")
+            server_id = b""
+        if self._auth_stop.is_set():
+            # the proxy loop has exited and no longer reads results
+            return
+        try:
+            self._auth_result_sender().send_multipart([source, server_id, *frames], copy=False)
+        except zmq.ZMQError as exc:
+            # context is shutting down
+            logger.debug("Dropping auth result: %s", exc)
+
+    def _auth_shard(self, frames) -> int:
+        # shard by client identity so requests from one client are validated (and routed) in arrival order;
+        # frames[0] is the client (or worker) id, or the empty delimiter for a client without an envelope
+        return hash(frames[0]) % len(self._auth_pools)
+
+    def _submit_auth(self, frames, token: str, source: bytes = AUTH_FROM_CLIENT) -> bool:
+        """
+        Queue a token validation on the client's auth shard. Returns False if that shard is full.
+        """
+        shard = self._auth_shard(frames)
+        if self._auth_in_flight[shard] >= AUTH_MAX_IN_FLIGHT_PER_WORKER:
+            return False
+        self._auth_in_flight[shard] += 1
+        self._auth_in_flight_total += 1
+        self._auth_pools[shard].submit(self._authenticate, frames, token, source)
+        return True
+
+    def _auth_done(self, frames) -> None:
+        self._auth_in_flight[self._auth_shard(frames)] -= 1
+        self._auth_in_flight_total -= 1
+
+    def _route_request(self, frames, server_id: bytes) -> None:
+        """
+        Route a client request whose token has been validated to the server of its user.
+        """
+        split = split_envelope(frames)
+        envelope, delimiter_index, body = split
+        if not server_id:
+            self._reply_error(envelope, "Token validation failed.")
+            return
+
+        # Route CANCEL request:
+        # client origin cancel request: body(token, "__REXEC_CANCEL__", "keyboard_interrupt")
+        if len(body) >= 2 and body[1] == STREAM_CANCEL_FRAME:
+            cancel_body = body[1:] if len(body) > 2 else [STREAM_CANCEL_FRAME, b"keyboard_interrupt"]
+            if envelope and self._cancel_pending(server_id, envelope[0]):
+                self._reply_error(envelope, "Request cancelled before dispatch.")
+                return
+            # a pooled request is cancelled on the worker running it
+            worker_id = self.client_workers.get(envelope[0], server_id) if envelope else server_id
+            outbound = [worker_id, *envelope, b"", *cancel_body]
+            log_routing_envelope(
+                "Frontend->Backend(CANCEL)",
+                frames,
+                self.frontend_zmq_addr,
+                self.backend_zmq_addr,
+                server_id=server_id,
+                split=split,
+            )
+            try:
+                self.backend_socket.send_multipart(outbound, copy=False)
+            except zmq.ZMQError as exc:
+                logger.warning("Cancel route failed for %s: %s", server_id.decode("utf-8"), exc)
+                self._reply_unavailable(envelope, server_id)
+            return
+
+        if len(body) < 3:
+            self._reply_error(envelope, "Invalid request framing.")
+            return
+
+        # Route INVOKE request:
+        # Users with a worker pool get their request load balanced across the pool,
+        # unless their 1:1 server is connected
+        if self.user_workers.get(server_id) and not self._direct_server_alive(server_id):
+            log_routing_envelope(
+                "Frontend->Backend(INVOKE)",
+                frames,
+                self.frontend_zmq_addr,
+                self.backend_zmq_addr,
+                server_id=server_id,
+                split=split,
+            )
+            if not self._dispatch_to_pool(server_id, envelope, body[1:]):
+                self._reply_unavailable(envelope, server_id)
+            return
+
+        # Otherwise route to appropriate server based on user_id; Server identity is user_id
+        # first frame(server_id) will not be delievered to server, it's used for routing(identify server) only
+        # so only send (envelope + b"" + body[1:]) to server
+        outbound = [server_id, *envelope, b"", *body[1:]]
+        # Log routing info
+        log_routing_envelope(
+            "Frontend->Backend(INVOKE)",
+            frames,
+            self.frontend_zmq_addr,
+            self.backend_zmq_addr,
+            server_id=server_id,
+            split=split,
+        )
+        try:
+            self.backend_socket.send_multipart(outbound, copy=False) # route to server
+        except zmq.ZMQError as exc:
+            logger.warning("Backend route failed for %s: %s", server_id.decode("utf-8"), exc)
+            self._reply_unavailable(envelope, server_id)
+
+    def _request_stop(self, signum, frame) -> None:
+        self._stop_requested = True
+
+    def _install_signal_wakeup(self):
+        """
+        Make SIGTERM set _stop_requested, which the proxy loop checks on every pass, and route the signal
+        to a socketpair watched by epoll so an idle loop wakes up too. Only possible from the main thread.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return None
+        self._signal_rsock, self._signal_wsock = socket.socketpair()
+        self._signal_rsock.setblocking(False)
+        self._signal_wsock.setblocking(False)
+        self._prev_sigterm_handler = signal.signal(signal.SIGTERM, self._request_stop)
+        # keep the embedder's wakeup fd (e.g. asyncio's) so it can be put back on shutdown
+        self._prev_wakeup_fd = signal.set_wakeup_fd(self._signal_wsock.fileno())
+        return self._signal_rsock.fileno()
+
+    def _restore_signal_handling(self) -> None:
+        if self._signal_wsock is None:
+            return
+        # restore first so a second SIGTERM during the rest of shutdown is not swallowed
+        signal.signal(signal.SIGTERM, self._prev_sigterm_handler)
+        signal.set_wakeup_fd(self._prev_wakeup_fd)
+        self._prev_wakeup_fd = -1
+        self._signal_rsock.close()
+        self._signal_wsock.close()
+        self._signal_rsock = self._signal_wsock = None
+
     def _proxy_loop(self):
         """
         Main loop for proxying messages between frontend(rexec client) and backend(rexec server) sockets.
         """
-        poller = zmq.Poller()
-        poller.register(self.frontend_socket, zmq.POLLIN)
-        poller.register(self.backend_socket, zmq.POLLIN)
-        poller.register(self.control_socket, zmq.POLLIN)
+        sockets = (self.control_socket, self.frontend_socket, self.auth_results_socket, self.backend_socket)
+        for sock in sockets:
+            self._epoll.register(sock.getsockopt(zmq.FD), select.EPOLLIN | select.EPOLLET)
+        # SIGTERM (e.g. pod shutdown) stops the broker like TERMINATE; the fd only wakes an idle loop
+        signal_fd = self._install_signal_wakeup()
+        if signal_fd is not None:
+            self._epoll.register(signal_fd, select.EPOLLIN)
 
         while True:
-            events = dict(poller.poll())
+            # checked every pass, so SIGTERM is honoured even when the sockets never go idle
+            if self._stop_requested:
+                logger.info("SIGTERM received, stopping broker")
+                break
+
+            # ZMQ FDs are edge-triggered and only signal that zmq.EVENTS may have changed,
+            # so check every socket and block in epoll only once none has pending input
+            if self.worker_users and time.monotonic() >= self._next_worker_sweep:
+                self._next_worker_sweep = time.monotonic() + WORKER_SWEEP_INTERVAL
+                self._expire_workers()
+
+            # with too many validations in flight, leave client requests queued in libzmq until results come back
+            auth_saturated = self._auth_in_flight_total >= AUTH_MAX_IN_FLIGHT
+            events = {
+                sock for sock in sockets
+                if not (auth_saturated and sock is self.frontend_socket) and sock.getsockopt(zmq.EVENTS) & zmq.POLLIN
+            }
+            if not events:
+                # wake up periodically while worker pools exist so silent workers get expired
+                timeout = WORKER_SWEEP_INTERVAL if self.worker_users else -1
+                if any(fd == signal_fd for fd, _ in self._epoll.poll(timeout)):
+                    # clear the wakeup bytes; _stop_requested is checked at the top of the loop
+                    while True:
+                        try:
+                            if not self._signal_rsock.recv(4096):
+                                break
+                        except BlockingIOError:
+                            break
+                continue
 
             # Handle control messages
             # ----------------------------------------------
             if self.control_socket in events:
                 msg = self.control_socket.recv()
-                logging.info("Control message received: %r", msg)
+                logger.info("Control message received: %r", msg)
                 self.control_socket.send(b"OK")
                 if msg in (b"TERMINATE", b"STOP", b"QUIT"):
-                    logging.info("Control requested broker shutdown")
+                    logger.info("Control requested broker shutdown")
                     break
             
             # Handle client request message
             # ----------------------------------------------
             if self.frontend_socket in events:
-                frames = self.frontend_socket.recv_multipart()
-                # client socket is ROUTER, so first frames are routing envelope
-                # frames = Generated:[envelope(generated val for client conn), delimiter(b"")] + Received:body(user_token, pfn, pargs)]
-                envelope, delimiter_index, body = split_envelope(frames)
+                for frames in drain(self.frontend_socket, zero_copy=self.zero_copy):
+                    # client socket is ROUTER, so first frames are routing envelope
+                    # frames = Generated:[envelope(generated val for client conn), delimiter(b"")] + Received:body(user_token, pfn, pargs)]
+                    split = split_envelope(frames)
+                    envelope, delimiter_index, body = split
+
+                    # Logging and validation
+                    if delimiter_index is None or len(body) < 2:
+                        log_routing_envelope(
+                            "Frontend->Backend",
+                            frames,
+                            self.frontend_zmq_addr,
+                            self.backend_zmq_addr,
+                            split=split,
+                        )
+                        self._reply_error(envelope, "Invalid request framing.")
+                        continue
+
+                    # Reject obviously malformed tokens before spending an auth call on them;
+                    # only enforce the JWT shape when tokens are verified as JWTs
+                    if not is_plausible_token(body[0], expect_jwt=self.jwt_validator is not None):
+                        self._reply_error(envelope, "Malformed token.")
+                        continue
 
-                # Logging and validation
-                if delimiter_index is None or len(body) < 2:
-                    log_routing_envelope(
-                        "Frontend->Backend",
-                        frames,
-                        self.frontend_zmq_addr,
-                        self.backend_zmq_addr,
-                    )
-                    self._reply_error(envelope, "Invalid request framing.")
-                    continue
-
-                try:
-                    # Extract and decode token from client message
-                    token = body[0].decode("utf-8")
-                except UnicodeDecodeError:
-                    self._reply_error(envelope, "Token is not valid utf-8.")
-                    continue
-                
-                # Validate token and extract user_id
-                user_id = validate_token(self.auth_api_url, token)
-                if not user_id:
-                    self._reply_error(envelope, "Token validation failed.")
-                    continue
-                
-                # Use user_id as server_id for routing; this assumes a 1:1 mapping between users and servers,
-                server_id = user_id.encode("utf-8")
-
-                # Route CANCEL request:
-                # client origin cancel request: body(token, "__REXEC_CANCEL__", "keyboard_interrupt")
-                if len(body) >= 2 and body[1] == STREAM_CANCEL_FRAME:
-                    cancel_body = body[1:] if len(body) > 2 else [STREAM_CANCEL_FRAME, b"keyboard_interrupt"]
-                    outbound = [server_id] + envelope + [b""] + cancel_body
-                    log_routing_envelope(
-                        "Frontend->Backend(CANCEL)",
-                        frames,
-                        self.frontend_zmq_addr,
-                        self.backend_zmq_addr,
-                        server_id=server_id,
-                    )
                     try:
-                        self.backend_socket.send_multipart(outbound)
-                    except zmq.ZMQError as exc:
-                        logging.warning("Cancel route failed for %s: %s", user_id, exc)
-                        self._reply_error(envelope, f"Server not ready/available for user {user_id}.")
-                    continue
-
-                if len(body) < 3:
-                    self._reply_error(envelope, "Invalid request framing.")
-                    continue
-
-                # Route INVOKE request:
-                # Route to appropriate server based on user_id; Server identity is user_id
-                # first frame(server_id) will not be delievered to server, it's used for routing(identify server) only
-                # so only send (envelope + b"" + body[1:]) to server
-                outbound = [server_id] + envelope + [b""] + body[1:]
-                # Log routing info
-                log_routing_envelope(
-                    "Frontend->Backend(INVOKE)",
-                    frames,
-                    self.frontend_zmq_addr,
-                    self.backend_zmq_addr,
-                    server_id=server_id,
-                )
-                try:
-                    self.backend_socket.send_multipart(outbound) # route to server
-                except zmq.ZMQError as exc:
-                    logging.warning("Backend route failed for %s: %s", user_id, exc)
-                    self._reply_error(envelope, f"Server not ready/available for user {user_id}.")
+                        # Extract and decode token from client message
+                        token = body[0].decode("utf-8")
+                    except UnicodeDecodeError:
+                        self._reply_error(envelope, "Token is not valid utf-8.")
+                        continue
+                
+                    # Validate token off the proxy thread; the result comes back on auth_results_socket
+                    if not self._submit_auth(frames, token):
+                        self._reply_error(envelope, "Too many requests awaiting authentication.")
+                        continue
+                    if self._auth_in_flight_total >= AUTH_MAX_IN_FLIGHT:
+                        break
+
+            # Route client request once its token has been validated
+            # ----------------------------------------------
+            if self.auth_results_socket in events:
+                for result in drain(self.auth_results_socket, zero_copy=self.zero_copy):
+                    # result = [source, server_id (empty if validation failed)] + original client or worker frames
+                    source, server_id, frames = result[0], result[1], result[2:]
+                    self._auth_done(frames)
+                    if source == AUTH_FROM_WORKER:
+                        self._worker_authenticated(frames[0], server_id)
+                    else:
+                        self._route_request(frames, server_id)
             
             # Handle server response message
             # ----------------------------------------------
             if self.backend_socket in events:
-                frames = self.backend_socket.recv_multipart()
-                if not frames:
-                    continue
-                # server socket is ROUTER, so first frame is server identity
-                # frames = Received:[server_id, envelope(client_id), delimiter(b""), body(pret)]
-                server_id = frames[0]
-                payload = frames[1:]
-                # Log keepalive activity if it's a heartbeat msg
-                if self._is_heartbeat(payload):
+                for frames in drain(self.backend_socket, zero_copy=self.zero_copy):
+                    # server socket is ROUTER, so first frame is server identity
+                    # frames = Received:[server_id, envelope(client_id), delimiter(b""), body(pret)]
+                    server_id = frames[0]
+                    payload = frames[1:]
+                    split = split_envelope(payload)
+                    # Log keepalive activity if it's a heartbeat msg
+                    if self._is_heartbeat(*split):
+                        self._record_server_activity(server_id)
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(
+                                "Heartbeat received from server %s",
+                                server_id.decode("utf-8", errors="replace"),
+                            )
+                        continue
                     self._record_server_activity(server_id)
-                    logging.debug(
-                        "Heartbeat received from server %s",
-                        server_id.decode("utf-8", errors="replace"),
+                    # Pooled worker announcing it is idle: payload = [b"", READY_FRAME, token]
+                    if self._is_ready(*split):
+                        self._submit_worker_auth(server_id, payload, split[2][1])
+                        continue
+                    # Log routing info for non-heartbeat messages
+                    log_routing_envelope(
+                        "Backend->Frontend",
+                        payload,
+                        self.backend_zmq_addr,
+                        self.frontend_zmq_addr,
+                        server_id=server_id,
+                        split=split,
                     )
-                    continue
-                self._record_server_activity(server_id)
-                # Log routing info for non-heartbeat messages
-                log_routing_envelope(
-                    "Backend->Frontend",
-                    payload,
-                    self.backend_zmq_addr,
-                    self.frontend_zmq_addr,
-                    server_id=server_id,
-                )
-                self.frontend_socket.send_multipart(payload) # route to client
+                    self.frontend_socket.send_multipart(payload, copy=False) # route to client
             
     def run(self):
         try:
-            logging.info(f"Proxy Starts...")
+            logger.info("Proxy Starts...")
             if self.debug:
                 frontend_monitor_thread = threading.Thread(target=event_monitor, args=(self.frontend_monitor,"Client Socket",))
                 backend_monitor_thread = threading.Thread(target=event_monitor, args=(self.backend_monitor,"Server Socket",))
                 control_monitor_thread = threading.Thread(target=event_monitor, args=(self.control_monitor,"Control Socket",))
 
-                frontend_monitor_thread.start()
-                backend_monitor_thread.start()
-                control_monitor_thread.start()
+                self.monitor_threads = [frontend_monitor_thread, backend_monitor_thread, control_monitor_thread]
+                for monitor_thread in self.monitor_threads:
+                    monitor_thread.start()
 
             # zmq.proxy_steerable(self.frontend_socket, self.backend_socket, None, self.control_socket) # does not support ROUTER sockets
             self._proxy_loop()
@@ -236,13 +648,30 @@ class RExecBroker:
             print("W: interrupt received, stopping broker...")
 
         finally:
+            self._epoll.close()
+            self._restore_signal_handling()
+            # drop queued validations, then wait for running ones to finish so every auth thread is done
+            # with its PUSH socket before the sockets are closed here and the context is destroyed
+            self._auth_stop.set()
+            for pool in self._auth_pools:
+                pool.shutdown(wait=False, cancel_futures=True)
+            for pool in self._auth_pools:
+                pool.shutdown(wait=True)
+            for sock in self._auth_senders:
+                sock.close()
+
+            if self.debug:
+                # stop monitoring before closing the sockets so each monitor thread
+                # receives EVENT_MONITOR_STOPPED and closes its own monitor socket
+                self.frontend_socket.disable_monitor()
+                self.backend_socket.disable_monitor()
+                self.control_socket.disable_monitor()
+                for monitor_thread in self.monitor_threads:
+                    monitor_thread.join()
+
             self.frontend_socket.close()
             self.backend_socket.close()
             self.control_socket.close()
-
-            if self.debug:
-                self.frontend_monitor.disable_monitor()
-                self.backend_monitor.disable_monitor()
-                self.control_monitor.disable_monitor()
+            self.auth_results_socket.close()
 
             self.zmq_context.destroy()
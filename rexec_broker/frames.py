@@ -1,5 +1,7 @@
 import logging
 
+logger = logging.getLogger(__name__)
+
 
 def format_identity(frame: bytes) -> str:
     """
@@ -15,42 +17,40 @@ def split_envelope(frames):
     """
     Logging helper: Split a list of ZMQ frames into envelope and body.
     """
-    for idx, frame in enumerate(frames):
-        if frame == b"":
-            envelope = frames[:idx]
-            body = frames[idx + 1:]
-            return envelope, idx, body
-    return [], None, frames
+    try:
+        idx = frames.index(b"")
+    except ValueError:
+        return [], None, frames
+    return frames[:idx], idx, frames[idx + 1:]
 
 
 def format_frames(frames, max_bytes=256, prefix="  "):
     """
     Logging helper: Format a list of ZMQ raw frames for logging.
+    Only the first max_bytes of each frame are copied, so large zero-copy frames are not materialized.
     """
-    lines = []
-    for idx, frame in enumerate(frames):
-        data = bytes(frame)
-        if len(data) > max_bytes:
-            preview = data[:max_bytes]
-            lines.append(
-                f"[{idx}] len={len(data)} data={preview!r}...<truncated>"
-            )
-        else:
-            lines.append(f"[{idx}] len={len(data)} data={data!r}")
-    return "\n".join(f"{prefix}{line}" for line in lines)
+    return "\n".join(
+        f"{prefix}[{idx}] len={len(frame)} data={bytes(memoryview(frame)[:max_bytes])!r}"
+        f"{'...<truncated>' if len(frame) > max_bytes else ''}"
+        for idx, frame in enumerate(frames)
+    )
 
 
-def log_routing_envelope(direction, frames, from_addr, to_addr, server_id=None):
+def log_routing_envelope(direction, frames, from_addr, to_addr, server_id=None, split=None):
     """
     Log the routing envelope of a message.
+    split is the caller's split_envelope(frames) result, if already computed.
+    No-op unless INFO is enabled, so the per-message formatting is skipped in production runs.
     """
-    envelope, delimiter_index, body = split_envelope(frames)
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    envelope, delimiter_index, body = split if split is not None else split_envelope(frames)
     client_id = format_identity(envelope[0]) if envelope else "<unknown>"
     server_label = server_id if server_id else "<unknown>"
 
     # if no delimiter, log "unknown" envelope
     if delimiter_index is None:
-        logging.info(
+        logger.info(
             "  %s | client=%s | server=%s | from=%s to=%s | routing envelope: <unknown> (no empty delimiter)",
             direction,
             client_id,
@@ -62,7 +62,7 @@ def log_routing_envelope(direction, frames, from_addr, to_addr, server_id=None):
     else:
         envelope_ids = [format_identity(frame) for frame in envelope]
         body_sizes = [len(frame) for frame in body]
-        logging.info(
+        logger.info(
             "  %s | client=%s | server=%s | from=%s to=%s | routing envelope: %s (delimiter frame %d, body frames=%d, body sizes=%s)",
             direction,
             client_id,
@@ -75,12 +75,13 @@ def log_routing_envelope(direction, frames, from_addr, to_addr, server_id=None):
             body_sizes,
         )
     # Detailed frames logging if run in debug mode
-    logging.debug(
-        " %s | client=%s | server=%s | from=%s to=%s | raw frames:\n%s",
-        direction,
-        client_id,
-        server_label,
-        from_addr,
-        to_addr,
-        format_frames(frames),
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            " %s | client=%s | server=%s | from=%s to=%s | raw frames:\n%s",
+            direction,
+            client_id,
+            server_label,
+            from_addr,
+            to_addr,
+            format_frames(frames),
+        )
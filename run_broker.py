@@ -25,6 +25,26 @@ if __name__ == "__main__":
         help="Auth API URL for token validation."
     )
 
+    parser.add_argument(
+        "--auth_jwt_issuer", type=str, default=os.environ.get("AUTH_JWT_ISSUER"),
+        help="JWT issuer URL; enables offline token validation against {issuer}/.well-known/jwks.json."
+    )
+
+    parser.add_argument(
+        "--auth_jwt_audience", type=str, default=os.environ.get("AUTH_JWT_AUDIENCE"),
+        help="Expected JWT audience for offline token validation."
+    )
+
+    parser.add_argument(
+        "--io_threads", type=int, default=int(os.environ.get("IO_THREADS", "1")),
+        help="Number of ZMQ I/O threads (default 1); raise for large payload throughput."
+    )
+
+    parser.add_argument(
+        "--zero_copy", action="store_true", default=os.environ.get("ZERO_COPY", "").lower() in ("1", "true", "yes"),
+        help="Forward frames of 64 KiB or more without copying; only worth it when payloads are mostly large."
+    )
+
     parser.add_argument(
         "-v", "--verbose",
         help="Be verbose",
@@ -0,0 +1,40 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+import zmq
+
+from rexec_broker import broker as broker_module
+from tests.helpers import TOKEN, USER, stop_broker
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    monkeypatch.setattr(
+        broker_module,
+        "validate_token",
+        lambda auth_api_url, token, jwt_validator=None: USER if token == TOKEN.decode() else None,
+    )
+    args = SimpleNamespace(
+        client_port="*", server_port="*", control_port="*",
+        auth_api_url="http://auth.invalid", auth_jwt_issuer=None, auth_jwt_audience=None,
+        io_threads=1, zero_copy=False, loglevel=None,
+    )
+    instance = broker_module.RExecBroker(args)
+    endpoints = {
+        name: getattr(instance, f"{name}_socket").getsockopt_string(zmq.LAST_ENDPOINT).replace("0.0.0.0", "127.0.0.1")
+        for name in ("frontend", "backend", "control")
+    }
+    thread = threading.Thread(target=instance.run, daemon=True)
+    thread.start()
+
+    ctx = zmq.Context()
+    instance.test_ctx = ctx
+    instance.endpoints = endpoints
+    yield instance
+
+    if thread.is_alive():
+        stop_broker(instance)
+    thread.join(5)
+    ctx.destroy(linger=0)
+    assert not thread.is_alive()
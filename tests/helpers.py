@@ -0,0 +1,55 @@
+import time
+
+import dill
+import zmq
+
+from rexec_broker import broker as broker_module
+
+TOKEN = b"header.payload.signature-alice"
+USER = b"alice"
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def connect_worker(broker, identity):
+    sock = broker.test_ctx.socket(zmq.DEALER)
+    sock.setsockopt(zmq.IDENTITY, identity)
+    sock.setsockopt(zmq.RCVTIMEO, 2000)
+    sock.connect(broker.endpoints["backend"])
+    return sock
+
+
+def send_ready(broker, worker, identity):
+    worker.send_multipart([b"", broker_module.READY_FRAME, TOKEN])
+    wait_until(lambda: identity in broker.idle_workers.get(USER, ()))
+
+
+def connect_client(broker):
+    sock = broker.test_ctx.socket(zmq.DEALER)
+    sock.setsockopt(zmq.RCVTIMEO, 2000)
+    sock.connect(broker.endpoints["frontend"])
+    return sock
+
+
+def invoke(client, arg):
+    client.send_multipart([b"", TOKEN, b"pfn", arg])
+
+
+def recv_error(client):
+    frames = client.recv_multipart()
+    assert frames[0] == b""
+    return dill.loads(frames[1])
+
+
+def stop_broker(broker):
+    control = broker.test_ctx.socket(zmq.REQ)
+    control.connect(broker.endpoints["control"])
+    control.send(b"TERMINATE")
+    control.recv()
+    control.close()
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from rexec_broker import broker as broker_module
+from tests.helpers import USER, connect_client, invoke, recv_error, stop_broker, wait_until
+
+
+@pytest.fixture
+def slow_auth(monkeypatch):
+    """
+    Token validation that blocks until released, counting the calls that started.
+    """
+    release = threading.Event()
+    calls = []
+
+    def validate_token(auth_api_url, token, jwt_validator=None):
+        calls.append(token)
+        release.wait(5)
+        return USER
+
+    monkeypatch.setattr(broker_module, "validate_token", validate_token)
+    yield release, calls
+    release.set()
+
+
+def test_full_auth_shard_fails_fast(broker, slow_auth, monkeypatch):
+    monkeypatch.setattr(broker_module, "AUTH_MAX_IN_FLIGHT_PER_WORKER", 2)
+    release, calls = slow_auth
+    client = connect_client(broker)
+
+    for arg in (b"a", b"b", b"c"):
+        invoke(client, arg)
+    assert recv_error(client) == "Too many requests awaiting authentication."
+
+    release.set()
+    assert recv_error(client) == "Server not ready/available for user alice."
+    assert recv_error(client) == "Server not ready/available for user alice."
+    assert len(calls) == 2
+
+
+def test_saturated_auth_stops_reading_clients(broker, slow_auth, monkeypatch):
+    monkeypatch.setattr(broker_module, "AUTH_MAX_IN_FLIGHT", 3)
+    release, calls = slow_auth
+    clients = [connect_client(broker) for _ in range(5)]
+
+    for client in clients:
+        invoke(client, b"a")
+    wait_until(lambda: broker._auth_in_flight_total == 3)
+    time.sleep(0.2)
+    # the other requests stay queued in libzmq instead of piling up in the auth queues
+    assert broker._auth_in_flight_total == 3
+    assert len(calls) <= 3
+
+    release.set()
+    for client in clients:
+        assert recv_error(client) == "Server not ready/available for user alice."
+    assert len(calls) == 5
+    wait_until(lambda: broker._auth_in_flight_total == 0)
+
+
+def test_shutdown_waits_for_running_validation(broker, slow_auth):
+    release, calls = slow_auth
+    client = connect_client(broker)
+    release.set()
+    invoke(client, b"a")
+    assert recv_error(client) == "Server not ready/available for user alice."
+
+    # a validation is still running when the broker stops
+    release.clear()
+    invoke(client, b"b")
+    wait_until(lambda: len(calls) == 2)
+    threading.Timer(0.3, release.set).start()
+    stop_broker(broker)
+
+    wait_until(lambda: all(sock.closed for sock in broker._auth_senders), timeout=5)
+    assert broker._auth_senders
+    assert all(not thread.is_alive() for pool in broker._auth_pools for thread in pool._threads)
@@ -0,0 +1,177 @@
+import time
+
+import pytest
+import zmq
+
+from rexec_broker import broker as broker_module
+from tests.helpers import TOKEN, USER, connect_client, connect_worker, invoke, recv_error, send_ready, wait_until
+
+
+def test_dispatches_to_least_recently_ready_worker(broker):
+    w1, w2 = connect_worker(broker, b"w1"), connect_worker(broker, b"w2")
+    send_ready(broker, w1, b"w1")
+    send_ready(broker, w2, b"w2")
+    client = connect_client(broker)
+
+    invoke(client, b"a")
+    assert w1.recv_multipart()[-1] == b"a"
+    invoke(client, b"b")
+    assert w2.recv_multipart()[-1] == b"b"
+
+    # w2 finishes first, so it is next in line
+    send_ready(broker, w2, b"w2")
+    send_ready(broker, w1, b"w1")
+    invoke(client, b"c")
+    assert w2.recv_multipart()[-1] == b"c"
+
+
+def test_reply_is_routed_back_to_client(broker):
+    worker = connect_worker(broker, b"w1")
+    send_ready(broker, worker, b"w1")
+    client = connect_client(broker)
+
+    invoke(client, b"a")
+    frames = worker.recv_multipart()
+    worker.send_multipart(frames[:-2] + [b"result"])
+    assert client.recv_multipart() == [b"", b"result"]
+
+
+def test_request_waits_for_busy_pool(broker):
+    worker = connect_worker(broker, b"w1")
+    send_ready(broker, worker, b"w1")
+    client = connect_client(broker)
+
+    invoke(client, b"first")
+    assert worker.recv_multipart()[-1] == b"first"
+    invoke(client, b"second")
+    wait_until(lambda: len(broker.pending_requests.get(USER, ())) == 1)
+
+    worker.send_multipart([b"", broker_module.READY_FRAME, TOKEN])
+    assert worker.recv_multipart()[-1] == b"second"
+
+
+def test_pending_queue_is_capped(broker, monkeypatch):
+    monkeypatch.setattr(broker_module, "MAX_PENDING_REQUESTS", 1)
+    worker = connect_worker(broker, b"w1")
+    send_ready(broker, worker, b"w1")
+    busy, queued, rejected = connect_client(broker), connect_client(broker), connect_client(broker)
+
+    invoke(busy, b"a")
+    worker.recv_multipart()
+    invoke(queued, b"b")
+    wait_until(lambda: len(broker.pending_requests.get(USER, ())) == 1)
+    invoke(rejected, b"c")
+    assert recv_error(rejected) == "Too many queued requests for user alice."
+
+
+def test_cancel_while_pending_drops_request(broker):
+    worker = connect_worker(broker, b"w1")
+    send_ready(broker, worker, b"w1")
+    busy, waiting = connect_client(broker), connect_client(broker)
+
+    invoke(busy, b"a")
+    worker.recv_multipart()
+    invoke(waiting, b"b")
+    wait_until(lambda: len(broker.pending_requests.get(USER, ())) == 1)
+    waiting.send_multipart([b"", TOKEN, broker_module.STREAM_CANCEL_FRAME, b"keyboard_interrupt"])
+    assert recv_error(waiting) == "Request cancelled before dispatch."
+
+    worker.send_multipart([b"", broker_module.READY_FRAME, TOKEN])
+    wait_until(lambda: b"w1" in broker.idle_workers[USER])
+    worker.setsockopt(zmq.RCVTIMEO, 200)
+    with pytest.raises(zmq.Again):
+        worker.recv_multipart()
+
+
+def test_cancel_is_routed_to_running_worker(broker):
+    w1, w2 = connect_worker(broker, b"w1"), connect_worker(broker, b"w2")
+    send_ready(broker, w1, b"w1")
+    send_ready(broker, w2, b"w2")
+    first, second = connect_client(broker), connect_client(broker)
+
+    invoke(first, b"a")
+    w1.recv_multipart()
+    invoke(second, b"b")
+    w2.recv_multipart()
+    second.send_multipart([b"", TOKEN, broker_module.STREAM_CANCEL_FRAME, b"keyboard_interrupt"])
+    assert w2.recv_multipart()[-2:] == [broker_module.STREAM_CANCEL_FRAME, b"keyboard_interrupt"]
+
+
+def test_silent_worker_is_expired(broker, monkeypatch):
+    monkeypatch.setattr(broker_module, "WORKER_TIMEOUT", 0.3)
+    monkeypatch.setattr(broker_module, "WORKER_SWEEP_INTERVAL", 0.05)
+    worker = connect_worker(broker, b"w1")
+    send_ready(broker, worker, b"w1")
+    running, waiting = connect_client(broker), connect_client(broker)
+
+    invoke(running, b"a")
+    worker.recv_multipart()
+    invoke(waiting, b"b")
+    # the worker dies mid-request: both the running and the queued request are failed
+    worker.close(linger=0)
+    assert recv_error(running) == "Server not ready/available for user alice."
+    assert recv_error(waiting) == "Server not ready/available for user alice."
+    assert USER not in broker.user_workers
+
+    # with the pool gone, the user falls back to 1:1 routing and fails fast
+    invoke(waiting, b"c")
+    assert recv_error(waiting) == "Server not ready/available for user alice."
+
+
+def test_heartbeats_keep_busy_worker_alive(broker, monkeypatch):
+    monkeypatch.setattr(broker_module, "WORKER_TIMEOUT", 0.3)
+    monkeypatch.setattr(broker_module, "WORKER_SWEEP_INTERVAL", 0.05)
+    worker = connect_worker(broker, b"w1")
+    send_ready(broker, worker, b"w1")
+    client = connect_client(broker)
+
+    invoke(client, b"a")
+    frames = worker.recv_multipart()
+    for _ in range(8):
+        worker.send_multipart([b"", broker_module.HEARTBEAT_FRAME])
+        time.sleep(0.1)
+    assert b"w1" in broker.worker_users
+    worker.send_multipart(frames[:-2] + [b"result"])
+    assert client.recv_multipart() == [b"", b"result"]
+
+
+def test_ready_with_invalid_token_is_not_pooled(broker, monkeypatch):
+    checked = []
+
+    def validate_token(auth_api_url, token, jwt_validator=None):
+        checked.append(token)
+        return USER if token == TOKEN.decode() else None
+
+    monkeypatch.setattr(broker_module, "validate_token", validate_token)
+    server = connect_worker(broker, USER)
+    server.send_multipart([b"", broker_module.HEARTBEAT_FRAME])
+    evil = connect_worker(broker, b"evil")
+    evil.send_multipart([b"", broker_module.READY_FRAME, b"not-alices-token-0123456789"])
+    wait_until(lambda: checked and broker._auth_in_flight_total == 0)
+    assert b"evil" not in broker.worker_users
+
+    client = connect_client(broker)
+    invoke(client, b"secret-args")
+    assert server.recv_multipart()[-1] == b"secret-args"
+
+
+def test_worker_with_rejected_token_leaves_pool(broker):
+    worker = connect_worker(broker, b"w1")
+    send_ready(broker, worker, b"w1")
+    worker.send_multipart([b"", broker_module.READY_FRAME, b"revoked-token-0123456789"])
+    wait_until(lambda: USER not in broker.user_workers)
+
+
+def test_connected_direct_server_takes_precedence_over_pool(broker):
+    server = connect_worker(broker, USER)
+    server.send_multipart([b"", broker_module.HEARTBEAT_FRAME])
+    wait_until(lambda: USER in broker.server_last_seen)
+    worker = connect_worker(broker, b"w1")
+    send_ready(broker, worker, b"w1")
+
+    client = connect_client(broker)
+    invoke(client, b"a")
+    assert server.recv_multipart()[-1] == b"a"
+    worker.setsockopt(zmq.RCVTIMEO, 200)
+    with pytest.raises(zmq.Again):
+        worker.recv_multipart()
@@ -0,0 +1,103 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import zmq
+
+from rexec_broker.broker import HEARTBEAT_FRAME, RExecBroker
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return str(sock.getsockname()[1])
+
+
+@pytest.fixture
+def broker_process():
+    ports = {name: free_port() for name in ("client", "server", "control")}
+    process = subprocess.Popen(
+        [
+            sys.executable, "run_broker.py",
+            "--client_port", ports["client"],
+            "--server_port", ports["server"],
+            "--control_port", ports["control"],
+        ],
+        cwd=REPO_ROOT,
+        env=dict(os.environ, AUTH_API_URL="http://auth.invalid"),
+    )
+    time.sleep(1.0) # let the broker bind and enter its loop
+    yield process, ports
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+def test_sigterm_stops_idle_broker(broker_process):
+    process, _ = broker_process
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=5) == 0
+
+
+def test_sigterm_stops_broker_under_load(broker_process):
+    process, ports = broker_process
+    ctx = zmq.Context()
+    server = ctx.socket(zmq.DEALER)
+    server.setsockopt(zmq.IDENTITY, b"alice")
+    server.setsockopt(zmq.SNDTIMEO, 100)
+    server.connect(f"tcp://127.0.0.1:{ports['server']}")
+    stop = threading.Event()
+
+    def flood():
+        while not stop.is_set():
+            try:
+                server.send_multipart([b"", HEARTBEAT_FRAME])
+            except zmq.Again:
+                pass
+
+    flooder = threading.Thread(target=flood)
+    flooder.start()
+    try:
+        time.sleep(0.5)
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=5) == 0
+    finally:
+        stop.set()
+        flooder.join()
+        ctx.destroy(linger=0)
+
+
+def test_signal_handling_is_restored():
+    args = SimpleNamespace(
+        client_port="*", server_port="*", control_port="*",
+        auth_api_url="http://auth.invalid", auth_jwt_issuer=None, auth_jwt_audience=None,
+        io_threads=1, zero_copy=False, loglevel=None,
+    )
+    broker = RExecBroker(args)
+    embedder_rsock, embedder_wsock = socket.socketpair()
+    embedder_wsock.setblocking(False)
+    embedder_handler = lambda signum, frame: None
+    prev_handler = signal.signal(signal.SIGTERM, embedder_handler)
+    prev_wakeup_fd = signal.set_wakeup_fd(embedder_wsock.fileno())
+    try:
+        assert broker._install_signal_wakeup() is not None
+        assert signal.getsignal(signal.SIGTERM) == broker._request_stop
+        broker._restore_signal_handling()
+        assert signal.getsignal(signal.SIGTERM) is embedder_handler
+        assert signal.set_wakeup_fd(-1) == embedder_wsock.fileno()
+    finally:
+        signal.set_wakeup_fd(prev_wakeup_fd)
+        signal.signal(signal.SIGTERM, prev_handler)
+        embedder_rsock.close()
+        embedder_wsock.close()
+        broker._epoll.close()
+        broker.zmq_context.destroy()